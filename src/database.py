@@ -1,8 +1,11 @@
 import sqlite3
+import sys
+import threading
+import time
 from typing import List, Optional, Dict, Set, Tuple
 from datetime import datetime
-from decimal import Decimal
-from models.transaction import Transaction
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP
+from models.transaction import Transaction, TransactionBatch, amount_to_cents
 
 class Database:
     """Handles all database operations for the budget tracker."""
@@ -15,6 +18,8 @@ class Database:
             api_key: Optional API key for AI services
         """
         self.db_path = db_path
+        # One long-lived connection per thread, opened on first use
+        self._local = threading.local()
         if api_key:
             from services.ai_handler import AIHandler
             self.ai_handler = AIHandler(api_key, self)
@@ -22,9 +27,41 @@ class Database:
             self.ai_handler = None
         self._create_tables()
     
+    def get_connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection, opening it on first use.
+        
+        SQLite connections can't be shared between threads, so each thread
+        keeps its own. Use it as ``with db.get_connection() as conn:`` to
+        commit or roll back the statements in the block.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+    
+    def table_exists(self, name: str) -> bool:
+        """Check whether a table exists in the database.
+        
+        Args:
+            name: The table name
+        """
+        cursor = self.get_connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+        )
+        return cursor.fetchone() is not None
+    
+    def count_rules(self) -> int:
+        """Get the number of categorization rules."""
+        cursor = self.get_connection().execute("SELECT COUNT(*) FROM categorization_rules")
+        return cursor.fetchone()[0]
+    
     def _create_tables(self) -> None:
         """Create database tables if they don't exist."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             
             # Create tables if they don't exist
@@ -59,6 +96,21 @@ class Database:
                 )
             """)
             
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ai_category_cache (
+                    description_norm TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    ts INTEGER
+                )
+            """)
+            
+            # Covering index for year-range queries: seek on date, then read
+            # the filter and summed columns straight from the index
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_txn_year 
+                ON transactions(date, transaction_type, ignored, category, amount)
+            """)
+            
             # Only check for table updates if the table exists
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='categorization_rules'")
             if cursor.fetchone():
@@ -77,7 +129,7 @@ class Database:
     
     def add_transaction(self, transaction: Transaction) -> int:
         """Add a new transaction to the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO transactions (date, amount, description, category, transaction_type)
@@ -89,19 +141,41 @@ class Database:
                 transaction.category,
                 transaction.transaction_type
             ))
-            return cursor.lastrowid
+        
+        self._invalidate_categories()
+        return cursor.lastrowid
+    
+    def add_transactions_bulk(self, batch: TransactionBatch) -> int:
+        """Add many transactions with a single executemany call.
+        
+        Doesn't commit, so a caller inserting several batches can keep them
+        in one database transaction; commit or roll back on
+        ``get_connection()`` once all batches are added.
+        
+        Args:
+            batch: Column-oriented rows to insert
+            
+        Returns:
+            The number of transactions added
+        """
+        self.get_connection().executemany("""
+            INSERT INTO transactions (date, amount, description, category, transaction_type)
+            VALUES (?, ?, ?, ?, ?)
+        """, batch.rows())
+        
+        self._invalidate_categories()
+        return len(batch)
     
     def get_transactions(self) -> List[Transaction]:
         """Get all transactions from the database."""
         print("\n=== DEBUG: Transaction Fetch ===")
         print(f"Database path: {self.db_path}")
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             
             # First check if table exists
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='transactions'")
-            if not cursor.fetchone():
+            if not self.table_exists("transactions"):
                 print("ERROR: transactions table does not exist!")
                 return []
             
@@ -128,32 +202,74 @@ class Database:
             
             print("===========================\n")
             
-            return [
-                Transaction(
-                    id=row[0],
-                    date=datetime.strptime(row[1], "%Y-%m-%dT%H:%M:%S"),
-                    amount=Decimal(str(row[2])),
-                    description=row[3],
-                    category=row[4],
-                    transaction_type=row[5],
-                    ignored=bool(row[6])
-                )
-                for row in rows
-            ]
+            return [self._row_to_transaction(row) for row in rows]
     
-    def get_category_totals(self) -> Dict[str, Decimal]:
-        """Get total spending by category."""
-        with sqlite3.connect(self.db_path) as conn:
+    def get_category_totals(self, transaction_type: Optional[str] = "expense") -> Dict[str, Decimal]:
+        """Get total spending by category.
+        
+        Args:
+            transaction_type: Only sum this type of transaction, or every
+                type if None (default "expense")
+        """
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT category, SUM(amount) 
                 FROM transactions 
-                WHERE transaction_type = 'expense'
+                WHERE (? IS NULL OR transaction_type = ?)
                 AND (ignored = 0 OR ignored IS NULL)
                 GROUP BY category
-            """)
+            """, (transaction_type, transaction_type))
             return {row[0]: Decimal(row[1]) for row in cursor.fetchall()}
 
+    def get_summary(self) -> Tuple[int, Optional[datetime], Optional[datetime], Dict[str, Decimal]]:
+        """Get an overview of all transactions without loading them.
+        
+        Returns:
+            Tuple of (transaction count, earliest date, latest date, totals of
+            non-ignored transactions by category); the dates are None if
+            there are no transactions
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), MIN(date), MAX(date) FROM transactions")
+            count, min_date, max_date = cursor.fetchone()
+        
+        return (
+            count,
+            datetime.fromisoformat(min_date) if min_date is not None else None,
+            datetime.fromisoformat(max_date) if max_date is not None else None,
+            self.get_category_totals(transaction_type=None)
+        )
+
+    def get_category_totals_for_year(self, year: int) -> Dict[str, Decimal]:
+        """Get total spending by category for a specific year.
+        
+        Args:
+            year: The target year
+            
+        Returns:
+            Dictionary mapping category to total non-ignored expenses
+        """
+        # A plain range on the ISO date string lets SQLite seek instead of scan
+        start_date = datetime(year, 1, 1).isoformat()
+        end_date = datetime(year + 1, 1, 1).isoformat()
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT category, SUM(amount) 
+                FROM transactions 
+                WHERE date >= ? AND date < ?
+                AND LOWER(transaction_type) = 'expense'
+                AND (ignored = 0 OR ignored IS NULL)
+                GROUP BY category
+            """, (start_date, end_date))
+            return {
+                row[0]: Decimal(str(row[1])).quantize(Decimal("0.01"))
+                for row in cursor.fetchall()
+            }
+
     def set_budget_goal(self, category: str, amount: Decimal) -> None:
         """Set or update a budget goal for a category.
         
@@ -161,12 +277,14 @@ class Database:
             category: The category name
             amount: The budget goal amount
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             conn.execute("""
                 INSERT INTO categories (name, budget_goal)
                 VALUES (?, ?)
                 ON CONFLICT(name) DO UPDATE SET budget_goal = ?
             """, (category, str(amount), str(amount)))
+        
+        self._invalidate_categories()
 
     def get_budget_goals(self) -> Dict[str, Decimal]:
         """Get all budget goals.
@@ -174,7 +292,7 @@ class Database:
         Returns:
             Dict mapping category names to their budget goals
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name, budget_goal FROM categories WHERE budget_goal IS NOT NULL")
             return {row[0]: Decimal(row[1]) for row in cursor.fetchall()}
@@ -188,7 +306,7 @@ class Database:
         Returns:
             The budget goal amount or None if not set
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT budget_goal FROM categories WHERE name = ?", (category,))
             row = cursor.fetchone()
@@ -197,7 +315,7 @@ class Database:
     def debug_print_categories(self) -> None:
         """Print all categories table data for debugging."""
         print("\n=== DEBUG: Categories Table Contents ===")
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name, budget_goal, tags FROM categories")
             rows = cursor.fetchall()
@@ -214,7 +332,7 @@ class Database:
             category: The category name
             tags: Comma-separated list of tags
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT INTO categories (name, tags)
@@ -222,6 +340,8 @@ class Database:
                 ON CONFLICT(name) DO UPDATE SET tags = ?
             """, (category, tags, tags))
             conn.commit()
+        
+        self._invalidate_categories()
 
     def get_category_tags(self) -> Dict[str, str]:
         """Get all category tags.
@@ -229,7 +349,7 @@ class Database:
         Returns:
             Dict mapping category names to their tags
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name, tags FROM categories WHERE tags IS NOT NULL")
             return {row[0]: row[1] for row in cursor.fetchall()}
@@ -240,17 +360,24 @@ class Database:
         Args:
             category: The category name to add
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR IGNORE INTO categories (name)
                 VALUES (?)
             """, (category,))
             conn.commit()
+        
+        self._invalidate_categories()
+
+    def _invalidate_categories(self) -> None:
+        """Drop the AI handler's cached category list after a write."""
+        if self.ai_handler is not None:
+            self.ai_handler.invalidate_categories()
 
     def get_all_categories(self) -> List[str]:
         """Get all unique categories from the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT DISTINCT name FROM categories
@@ -258,7 +385,7 @@ class Database:
                 SELECT DISTINCT category FROM transactions
                 WHERE category IS NOT NULL AND category != ''
             """)
-            return [row[0] for row in cursor.fetchall()]
+            return [sys.intern(row[0]) for row in cursor.fetchall()]
 
     def delete_category(self, category: str) -> None:
         """Delete a category from the database.
@@ -266,10 +393,12 @@ class Database:
         Args:
             category: The category name to delete
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM categories WHERE name = ?", (category,))
             conn.commit()
+        
+        self._invalidate_categories()
 
     def delete_transaction(self, transaction_id: int) -> None:
         """Delete a transaction from the database.
@@ -278,7 +407,7 @@ class Database:
             transaction_id: The ID of the transaction to delete
         """
         print(f"Deleting transaction with ID: {transaction_id}")  # Debug log
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM transactions WHERE id = ?", (transaction_id,))
             transaction = cursor.fetchone()
@@ -288,6 +417,8 @@ class Database:
             rows_affected = cursor.rowcount
             conn.commit()
             print(f"Rows affected by delete: {rows_affected}")  # Debug log 
+        
+        self._invalidate_categories()
 
     def get_transactions_for_month(self, date: datetime) -> List[Transaction]:
         """Get all transactions for a specific month.
@@ -304,7 +435,7 @@ class Database:
         else:
             end_date = date.replace(month=date.month + 1, day=1).isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, date, amount, description, category, transaction_type, ignored 
@@ -313,18 +444,7 @@ class Database:
                 ORDER BY date
             """, (start_date, end_date))
             
-            return [
-                Transaction(
-                    id=row[0],
-                    date=datetime.fromisoformat(row[1]),
-                    amount=Decimal(row[2]),
-                    description=row[3],
-                    category=row[4],
-                    transaction_type=row[5],
-                    ignored=bool(row[6])
-                )
-                for row in cursor.fetchall()
-            ]
+            return [self._row_to_transaction(row) for row in cursor.fetchall()]
 
     def get_transactions_for_year(self, year: int) -> List[Transaction]:
         """Get all transactions for a specific year.
@@ -338,7 +458,7 @@ class Database:
         start_date = datetime(year, 1, 1).isoformat()
         end_date = datetime(year + 1, 1, 1).isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, date, amount, description, category, transaction_type, ignored 
@@ -347,18 +467,7 @@ class Database:
                 ORDER BY date
             """, (start_date, end_date))
             
-            return [
-                Transaction(
-                    id=row[0],
-                    date=datetime.fromisoformat(row[1]),
-                    amount=Decimal(row[2]),
-                    description=row[3],
-                    category=row[4],
-                    transaction_type=row[5],
-                    ignored=bool(row[6])
-                )
-                for row in cursor.fetchall()
-            ] 
+            return [self._row_to_transaction(row) for row in cursor.fetchall()] 
 
     def update_transaction_category(self, transaction_id: int, new_category: str) -> None:
         """Update the category of a transaction.
@@ -371,7 +480,7 @@ class Database:
             Exception: If the update fails
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.get_connection() as conn:
                 # First ensure the category exists in categories table
                 conn.execute("""
                     INSERT OR IGNORE INTO categories (name)
@@ -387,6 +496,8 @@ class Database:
                 
         except sqlite3.Error as e:
             raise Exception(f"Failed to update transaction category: {str(e)}") 
+        
+        self._invalidate_categories()
 
     def update_transaction_by_attributes(
         self,
@@ -409,7 +520,7 @@ class Database:
             Exception: If the update fails
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.get_connection() as conn:
                 # First ensure the category exists in categories table
                 conn.execute("""
                     INSERT OR IGNORE INTO categories (name)
@@ -440,6 +551,8 @@ class Database:
                 
         except sqlite3.Error as e:
             raise Exception(f"Failed to update transaction category: {str(e)}")
+        
+        self._invalidate_categories()
 
     def add_categorization_rule(
         self, 
@@ -458,7 +571,7 @@ class Database:
             tolerance: Amount tolerance (default $0.01)
             priority: Rule priority (higher numbers run first)
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 INSERT OR REPLACE INTO categorization_rules 
@@ -466,6 +579,8 @@ class Database:
                 VALUES (?, ?, ?, ?, ?)
             """, (pattern, category, amount, tolerance, priority))
             conn.commit()
+        
+        self._invalidate_categories()
 
     def get_categorization_rules(self) -> List[Tuple[str, str, Optional[Decimal], Decimal, int]]:
         """Get all categorization rules.
@@ -473,7 +588,7 @@ class Database:
         Returns:
             List of tuples containing (pattern, category, amount, tolerance, priority)
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT pattern, category, amount, amount_tolerance, priority 
@@ -498,7 +613,7 @@ class Database:
             pattern: Pattern to match
             category: Category to assign
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM categorization_rules 
@@ -514,7 +629,7 @@ class Database:
         Returns:
             Matching category or None if no rules match
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             # Escape special characters in the description
             escaped_description = description.replace('%', '\\%').replace('_', '\\_')
@@ -527,6 +642,35 @@ class Database:
             result = cursor.fetchone()
             return result[0] if result else None
 
+    def get_cached_ai_category(self, description_norm: str) -> Optional[str]:
+        """Get a previously suggested AI category for a normalized description.
+        
+        Args:
+            description_norm: Lower-cased, whitespace-collapsed description
+            
+        Returns:
+            The cached category, or None if there is no cache entry
+        """
+        cursor = self.get_connection().execute(
+            "SELECT category FROM ai_category_cache WHERE description_norm = ?",
+            (description_norm,)
+        )
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def cache_ai_category(self, description_norm: str, category: str) -> None:
+        """Store an AI category suggestion for a normalized description.
+        
+        Args:
+            description_norm: Lower-cased, whitespace-collapsed description
+            category: The suggested category
+        """
+        with self.get_connection() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO ai_category_cache (description_norm, category, ts)
+                VALUES (?, ?, ?)
+            """, (description_norm, category, int(time.time())))
+    
     def apply_rules_to_existing_transactions(self) -> None:
         """Apply categorization rules to all transactions.
         
@@ -535,50 +679,99 @@ class Database:
         2. Get all categorization rules ordered by priority
         3. For each transaction, apply the first matching rule
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get all transactions (removed the category filter)
-            cursor.execute("""
-                SELECT id, description, amount, date, transaction_type 
-                FROM transactions
-            """)
-            transactions = cursor.fetchall()
-            
-            # Get all rules ordered by priority
-            cursor.execute("""
-                SELECT pattern, category, amount, amount_tolerance, priority 
-                FROM categorization_rules 
-                ORDER BY priority DESC
-            """)
-            rules = cursor.fetchall()
-            
-            # Process each transaction
-            updates_made = 0
-            for trans_id, description, trans_amount, date, trans_type in transactions:
-                for pattern, category, rule_amount, tolerance, priority in rules:
-                    # Check if description matches pattern
-                    if pattern.lower() in description.lower():
-                        # If rule has an amount, check if it matches within tolerance
-                        if rule_amount is not None:
-                            rule_amount = Decimal(str(rule_amount))
-                            tolerance = Decimal(str(tolerance or "0.01"))
-                            trans_amount = Decimal(str(trans_amount))
-                            
-                            if abs(trans_amount - rule_amount) > tolerance:
-                                continue  # Amount doesn't match within tolerance
-                        
-                        # Update the transaction with the matching category
-                        cursor.execute("""
-                            UPDATE transactions 
-                            SET category = ? 
-                            WHERE id = ?
-                        """, (category, trans_id))
-                        updates_made += 1
-                        break  # Stop checking rules for this transaction
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # Get all transactions (removed the category filter)
+        cursor.execute("""
+            SELECT id, description, amount, date, transaction_type 
+            FROM transactions
+        """)
+        transactions = cursor.fetchall()
+        
+        # Get all rules ordered by priority
+        cursor.execute("""
+            SELECT pattern, category, amount, amount_tolerance, priority 
+            FROM categorization_rules 
+            ORDER BY priority DESC
+        """)
+        rules = cursor.fetchall()
+        
+        # Pre-scale rule amounts and tolerances to whole cents once,
+        # so the per-transaction checks are plain int compares
+        prepared_rules = []
+        for pattern, category, rule_amount, tolerance, priority in rules:
+            if rule_amount is not None:
+                rule_cents = self._to_cents(rule_amount)
+                tolerance_cents = self._to_cents(tolerance or "0.01", ROUND_FLOOR)
+            else:
+                rule_cents = tolerance_cents = None
+            prepared_rules.append((pattern.lower(), category, rule_cents, tolerance_cents))
+        
+        # Process each transaction
+        updates = []
+        for trans_id, description, trans_amount, date, trans_type in transactions:
+            description_lower = (description or "").lower()
+            trans_cents = self._to_cents(trans_amount)
+            for pattern, category, rule_cents, tolerance_cents in prepared_rules:
+                # Check if description matches pattern
+                if pattern in description_lower:
+                    # If rule has an amount, check if it matches within tolerance
+                    if rule_cents is not None:
+                        if abs(trans_cents - rule_cents) > tolerance_cents:
+                            continue  # Amount doesn't match within tolerance
+                    
+                    # Queue the update with the matching category
+                    updates.append((category, trans_id))
+                    break  # Stop checking rules for this transaction
+        
+        # Write every update in one short transaction so SQLite syncs to disk
+        # once; the reads and matching above run without holding the write lock
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany("""
+                UPDATE transactions 
+                SET category = ? 
+                WHERE id = ?
+            """, updates)
             
             conn.commit()
-            print(f"Updated {updates_made} transactions")  # Debug log
+        except Exception:
+            conn.rollback()
+            raise
+        
+        print(f"Updated {len(updates)} transactions")  # Debug log
+        
+        self._invalidate_categories()
+
+    @staticmethod
+    def _row_to_transaction(row: Tuple) -> Transaction:
+        """Build a Transaction from an (id, date, amount, description,
+        category, transaction_type, ignored) row.
+        
+        Category and type come from a small vocabulary, so they are interned
+        and compare by identity in the filters.
+        """
+        category = row[4]
+        return Transaction(
+            id=row[0],
+            date=datetime.fromisoformat(row[1]),
+            amount=Decimal(str(row[2])),
+            description=row[3],
+            category=sys.intern(category) if category is not None else None,
+            transaction_type=sys.intern(row[5]),
+            ignored=bool(row[6])
+        )
+
+    @staticmethod
+    def _to_cents(value, rounding: str = ROUND_HALF_UP) -> int:
+        """Convert a stored amount (number or numeric string) to whole cents.
+        
+        Args:
+            value: The amount as returned by SQLite
+            rounding: Decimal rounding mode for sub-cent values
+        """
+        return amount_to_cents(Decimal(str(value)), rounding)
 
     def delete_transaction_by_attributes(
         self,
@@ -597,7 +790,7 @@ class Database:
             category: The transaction category
             transaction_type: The type of transaction (income/expense)
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 DELETE FROM transactions 
@@ -613,4 +806,6 @@ class Database:
                 category,
                 transaction_type
             ))
-            conn.commit() 
\ No newline at end of file
+            conn.commit() 
+        
+        self._invalidate_categories()
\ No newline at end of file
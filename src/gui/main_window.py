@@ -1,10 +1,11 @@
+import re
+import sys
 import tkinter as tk
-import sqlite3
 
 from tkinter import ttk, messagebox, filedialog
-from typing import Callable, Optional, List
+from typing import Callable, Dict, Iterable, Optional, List, Sequence
 from datetime import datetime
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal, InvalidOperation, ROUND_CEILING, ROUND_FLOOR
 from models.transaction import Transaction
 from database import Database
 from services.csv_handler import CSVHandler
@@ -16,6 +17,10 @@ from gui.rules_window import RulesWindow
 class MainWindow:
     """Main application window for the budget tracker."""
     
+    FILTER_DELAY_MS = 200  # Wait this long after the last keystroke before filtering
+    TREE_PAGE_SIZE = 100   # Transactions inserted into the tree per page
+    TYPE_CODE_BITS = 8     # Low bits of a packed category/type code holding the type
+    
     def __init__(self, db: Database):
         """Initialize the main window."""
         self.db = db
@@ -30,7 +35,7 @@ class MainWindow:
         transactions = self.db.get_transactions()
         print(f"Found {len(transactions)} transactions")
         if transactions:
-            print("Sample transaction:", vars(transactions[0]))
+            print("Sample transaction:", transactions[0])
         print("==============================\n")
         
         # Create main container with PanedWindow
@@ -52,7 +57,27 @@ class MainWindow:
         self.desc_entry = None
         self.category_entry = None
         self.tree = None
-        
+
+        # Loaded transactions plus column arrays used by the filters
+        self._transactions: List[Transaction] = []
+        self._date_days: List[int] = []
+        self._amounts_cents: List[int] = []
+        self._descriptions: List[str] = []
+        self._cattype_codes: List[int] = []
+        self._cat_labels: List[str] = []
+        self._type_labels: List[str] = []
+        self._filter_job: Optional[str] = None
+
+        # Last parsed filter state and its result, reused when filters tighten
+        self._last_filters: Optional[tuple] = None
+        self._last_result: Sequence[int] = []
+
+        # Indices (into self._transactions) of the rows the tree should show;
+        # only the first self._rendered_count of them are inserted so far
+        self._visible_indices: Sequence[int] = []
+        self._rendered_count = 0
+        self._tree_render_pending = False
+
         # Create notebook in left frame
         self.notebook = ttk.Notebook(self.left_frame)
         self.notebook.pack(fill="both", expand=True)
@@ -201,6 +226,13 @@ class MainWindow:
         self.type_filter.set("All")
         self.type_filter.pack(side="left", padx=2)
         
+        # Re-filter as the user types, debounced so a burst of keys runs once
+        for widget in (self.start_date, self.end_date, self.min_amount,
+                       self.max_amount, self.desc_filter, self.category_filter):
+            widget.bind("<KeyRelease>", self._schedule_filter)
+        for widget in (self.category_filter, self.type_filter):
+            widget.bind("<<ComboboxSelected>>", self._schedule_filter)
+        
         # Show Hidden Transactions checkbox
         show_hidden_frame = ttk.Frame(filter_frame)
         show_hidden_frame.pack(fill="x", padx=5, pady=2)
@@ -314,17 +346,17 @@ class MainWindow:
     def _setup_tree(self) -> None:
         """Set up the transaction treeview."""
         # Create scrollbar
-        scrollbar = ttk.Scrollbar(self.main_tab)
-        scrollbar.pack(side="right", fill="y")
+        self.tree_scrollbar = ttk.Scrollbar(self.main_tab)
+        self.tree_scrollbar.pack(side="right", fill="y")
 
         # Create treeview
         self.tree = ttk.Treeview(
             self.main_tab,
             columns=("date", "amount", "description", "category", "type"),
             show="headings",
-            yscrollcommand=scrollbar.set
+            yscrollcommand=self._on_tree_scroll
         )
-        scrollbar.config(command=self.tree.yview)
+        self.tree_scrollbar.config(command=self.tree.yview)
         
         # Configure columns
         self.tree.heading("date", text="Date", command=lambda: self._sort_by("date"))
@@ -396,9 +428,7 @@ class MainWindow:
             filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
         )
         if file_path:
-            transactions = CSVHandler.import_transactions(file_path, self.db)
-            for transaction in transactions:
-                self.db.add_transaction(transaction)
+            CSVHandler.import_transactions(file_path, self.db)
             self._refresh_transactions()
     
     def _show_context_menu(self, event) -> None:
@@ -432,7 +462,7 @@ class MainWindow:
         selected_items = self.tree.selection()
         
         try:
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.get_connection() as conn:
                 cursor = conn.cursor()
                 
                 # Get all selected transaction details and their current ignored states
@@ -534,7 +564,7 @@ class MainWindow:
             transaction_type = values[4]
             
             # Get current state from database
-            with sqlite3.connect(self.db.db_path) as conn:
+            with self.db.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("""
                     SELECT ignored FROM transactions 
@@ -609,25 +639,60 @@ class MainWindow:
         """Refresh the transactions display."""
         print("\n=== Refreshing Transactions ===")
         
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
         # Get transactions
-        transactions = self.db.get_transactions()
+        transactions = self._load_transactions()
         print(f"Retrieved {len(transactions)} transactions from database")
         
-        # Counter for visible transactions
-        visible_count = 0
+        visible_count = self._show_transactions(range(len(transactions)))
         
-        # Add transactions to tree
-        for transaction in transactions:
-            print(f"Processing transaction: {vars(transaction)}")
-            # Skip hidden transactions if show_hidden is False
-            if transaction.ignored and not self.show_hidden_var.get():
-                print("Skipping hidden transaction")
-                continue
+        print(f"Showing {visible_count} visible transactions in tree")
+        print("===============================\n")
+    
+    def _show_transactions(self, indices: Sequence[int]) -> int:
+        """Replace the tree contents with the given loaded transactions.
+        
+        Only the first page is inserted right away; the rest is inserted as
+        the user scrolls, or all at once by _render_all_transactions.
+        
+        Args:
+            indices: Indices into self._transactions to show, in display order
             
+        Returns:
+            The number of rows shown, after hiding ignored transactions
+        """
+        # Clear existing items
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        
+        # Skip hidden transactions if show_hidden is False
+        if not self.show_hidden_var.get():
+            transactions = self._transactions
+            indices = [i for i in indices if not transactions[i].ignored]
+        
+        self._visible_indices = indices
+        self._rendered_count = 0
+        self._render_more_transactions()
+        return len(indices)
+    
+    def _render_more_transactions(self, limit: Optional[int] = None) -> None:
+        """Insert the next rows of the current view into the tree.
+        
+        Args:
+            limit: Maximum number of rows to insert (defaults to one page)
+        """
+        self._tree_render_pending = False
+        transactions = self._transactions
+        start = self._rendered_count
+        end = min(start + (limit or self.TREE_PAGE_SIZE), len(self._visible_indices))
+        
+        # Call the Tcl insert command directly, skipping ttk's option formatting;
+        # the command and widget path are hoisted out of the loop
+        call = self.tree.tk.call
+        widget = self.tree._w
+        hidden = ("hidden",)
+        for i in self._visible_indices[start:end]:
+            transaction = transactions[i]
             values = (
                 transaction.date.strftime("%Y-%m-%d"),
                 f"${transaction.amount:,.2f}",
@@ -635,59 +700,86 @@ class MainWindow:
                 transaction.category,
                 transaction.transaction_type
             )
-            # Insert the item and get its ID
-            item_id = self.tree.insert("", "end", values=values)
-            visible_count += 1
-            
-            # If the transaction is ignored, add the "hidden" tag
-            if transaction.ignored:
-                self.tree.item(item_id, tags=("hidden",))
+            # Ignored transactions get the "hidden" tag
+            tags = hidden if transaction.ignored else ()
+            call(widget, "insert", "", "end", "-values", values, "-tags", tags)
         
-        print(f"Added {visible_count} visible transactions to tree")
-        print("===============================\n")
+        self._rendered_count = end
+    
+    def _render_all_transactions(self) -> None:
+        """Insert every remaining row, for actions that work on the whole list."""
+        remaining = len(self._visible_indices) - self._rendered_count
+        if remaining > 0:
+            self._render_more_transactions(remaining)
     
+    def _on_tree_scroll(self, first: str, last: str) -> None:
+        """Update the scrollbar and load another page near the bottom of the list."""
+        self.tree_scrollbar.set(first, last)
+        if (float(last) > 0.9
+                and self._rendered_count < len(self._visible_indices)
+                and not self._tree_render_pending):
+            self._tree_render_pending = True
+            self.tree.after_idle(self._render_more_transactions)
+
+    def _load_transactions(self) -> List[Transaction]:
+        """Fetch all transactions and rebuild the filter columns.
+
+        Each column holds one attribute for every transaction, indexed the
+        same way as ``self._transactions``. Category and type are packed
+        into one integer code per row, ``(category_code << 8) | type_code``,
+        so both filters are a single masked int compare.
+        """
+        transactions = self.db.get_transactions()
+
+        cat_index: Dict[str, int] = {}
+        type_index: Dict[str, int] = {}
+
+        self._transactions = transactions
+        self._date_days = [t.date_epoch for t in transactions]
+        self._amounts_cents = [t.amount_cents for t in transactions]
+        self._descriptions = [t.description or "" for t in transactions]
+        # Only "income" and "expense" are used, so types fit in the low 8 bits
+        self._cattype_codes = [
+            (cat_index.setdefault(t.category, len(cat_index)) << self.TYPE_CODE_BITS)
+            | type_index.setdefault(t.transaction_type.lower(), len(type_index))
+            for t in transactions
+        ]
+        self._cat_labels = list(cat_index)
+        self._type_labels = [sys.intern(label) for label in type_index]
+
+        # Cached filter results index the old columns
+        self._last_filters = None
+        self._last_result = []
+
+        return transactions
+
     def _clear_inputs(self) -> None:
         """Clear all input fields."""
         self.amount_entry.delete(0, tk.END)
         self.desc_entry.delete(0, tk.END)
         self.category_entry.delete(0, tk.END)
     
+    def _schedule_filter(self, event=None) -> None:
+        """Apply the filters once the user has stopped typing."""
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(self.FILTER_DELAY_MS, self._apply_filters)
+    
+    def _cancel_scheduled_filter(self) -> None:
+        """Cancel a pending debounced filter run, if any."""
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+            self._filter_job = None
+    
     def _apply_filters(self) -> None:
         """Apply all filters to the transactions view."""
+        self._cancel_scheduled_filter()
         try:
-            # Clear existing items
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Get filtered transactions
-            filtered_transactions = self._get_filtered_transactions()
-            
-            # Counter for visible transactions
-            visible_count = 0
-            
-            # Add filtered transactions to tree
-            for transaction in filtered_transactions:
-                # Skip hidden transactions if show_hidden is False
-                if transaction.ignored and not self.show_hidden_var.get():
-                    continue
-                
-                values = (
-                    transaction.date.strftime("%Y-%m-%d"),
-                    f"${transaction.amount:,.2f}",
-                    transaction.description,
-                    transaction.category,
-                    transaction.transaction_type
-                )
-                # Insert the item and get its ID
-                item_id = self.tree.insert("", "end", values=values)
-                visible_count += 1
-                
-                # If the transaction is ignored, add the "hidden" tag
-                if transaction.ignored:
-                    self.tree.item(item_id, tags=("hidden",))
+            # Show the filtered transactions
+            visible_count = self._show_transactions(self._get_filtered_indices())
             
             # Update the transaction counter
-            total = len(self.db.get_transactions())
+            total = len(self._transactions)
             if visible_count == total:
                 self.transaction_counter.config(text=f"Showing all {visible_count} transactions")
             else:
@@ -703,8 +795,9 @@ class MainWindow:
         self.min_amount.delete(0, tk.END)
         self.max_amount.delete(0, tk.END)
         self.desc_filter.delete(0, tk.END)
-        self.category_filter.set("")
+        self.category_filter.set("All")
         self.type_filter.set("All")
+        self._cancel_scheduled_filter()
         self._refresh_transactions()
     
     def _update_selection_label(self) -> None:
@@ -810,12 +903,10 @@ class MainWindow:
     
     def _select_all_filtered(self) -> None:
         """Select all transactions currently visible in the tree."""
-        # Clear current selection
-        self.tree.selection_set()  # Clear selection
+        self._render_all_transactions()
         
-        # Select all items in the tree
-        for item in self.tree.get_children():
-            self.tree.selection_add(item)
+        # Replace the selection with every item in the tree in one call
+        self.tree.selection_set(self.tree.get_children())
         
         # Update selection label
         self._update_selection_label()
@@ -855,6 +946,7 @@ class MainWindow:
             column: The column name to sort by
         """
         # Get all items
+        self._render_all_transactions()
         items = [(self.tree.set(item, column), item) for item in self.tree.get_children("")]
         
         # Determine sort order (toggle between ascending and descending)
@@ -886,81 +978,179 @@ class MainWindow:
             self.tree.heading(col, text=text)
         self.tree.heading(column, text=f"{self.tree.heading(column)['text'].split()[0]} {arrow}")
     
-    def _get_filtered_transactions(self) -> List[Transaction]:
-        """Get transactions based on current filter settings."""
-        transactions = self.db.get_transactions()
-        
+    def _get_filtered_indices(self) -> Sequence[int]:
+        """Get the indices of loaded transactions matching the current filters."""
+        transactions = self._transactions
+
+        # Read each filter widget once
+        start_text = self.start_date.get().strip()
+        end_text = self.end_date.get().strip()
+        min_text = self.min_amount.get().strip()
+        max_text = self.max_amount.get().strip()
+        desc_filter = self.desc_filter.get().strip()
+        # Interned so the label lookups below match by identity
+        category = sys.intern(self.category_filter.get())
+        type_filter = self.type_filter.get()
+
         # If no filters are active, return all transactions
-        if (not self.start_date.get().strip() and
-            not self.end_date.get().strip() and
-            not self.min_amount.get().strip() and
-            not self.max_amount.get().strip() and
-            not self.desc_filter.get().strip() and
-            self.category_filter.get() == "All" and
-            self.type_filter.get() == "All"):
-            return transactions
-        
-        # Rest of the filtering logic remains the same
-        filtered = []
-        for transaction in transactions:
-            # Apply all filters...
-            if self._transaction_matches_filters(transaction):
-                filtered.append(transaction)
-        
-        return filtered
+        if (not start_text and not end_text and not min_text and not max_text
+                and not desc_filter and category == "All" and type_filter == "All"):
+            return range(len(transactions))
 
-    def _transaction_matches_filters(self, transaction: Transaction) -> bool:
-        """Check if a transaction matches all current filters."""
-        # Date filters
-        if self.start_date.get().strip():
-            try:
-                start = datetime.strptime(self.start_date.get().strip(), "%Y-%m-%d")
-                if transaction.date < start:
-                    return False
-            except ValueError:
-                pass
+        # Parse the filter values once; invalid values disable that filter
+        start = self._parse_filter_date(start_text)
+        end = self._parse_filter_date(end_text)
+        min_cents = self._parse_filter_cents(min_text, ROUND_CEILING)
+        max_cents = self._parse_filter_cents(max_text, ROUND_FLOOR)
+        desc_re = re.compile(re.escape(desc_filter), re.IGNORECASE) if desc_filter else None
 
-        if self.end_date.get().strip():
-            try:
-                end = datetime.strptime(self.end_date.get().strip(), "%Y-%m-%d")
-                if transaction.date > end:
-                    return False
-            except ValueError:
-                pass
+        # Build the mask and target for the packed category/type code
+        type_mask = (1 << self.TYPE_CODE_BITS) - 1
+        cattype_mask = 0
+        cattype_target = 0
+        if category != "All":
+            if category not in self._cat_labels:
+                return []
+            cattype_mask |= ~type_mask
+            cattype_target |= self._cat_labels.index(category) << self.TYPE_CODE_BITS
+        if type_filter != "All":
+            type_label = sys.intern(type_filter.lower())
+            if type_label not in self._type_labels:
+                return []
+            cattype_mask |= type_mask
+            cattype_target |= self._type_labels.index(type_label)
 
-        # Amount filters
-        if self.min_amount.get().strip():
-            try:
-                min_val = Decimal(self.min_amount.get().strip())
-                if transaction.amount < min_val:
-                    return False
-            except (ValueError, InvalidOperation):
-                pass
+        # When the filters only got tighter, rescan the previous result
+        filters = (start, end, min_cents, max_cents, desc_filter.lower(),
+                   cattype_mask, cattype_target)
+        if self._last_filters is not None and self._filters_tighten(self._last_filters, filters):
+            candidates = self._last_result
+        else:
+            candidates = range(len(transactions))
 
-        if self.max_amount.get().strip():
-            try:
-                max_val = Decimal(self.max_amount.get().strip())
-                if transaction.amount > max_val:
-                    return False
-            except (ValueError, InvalidOperation):
-                pass
+        indices = self._filter_indices(
+            candidates,
+            self._date_days,
+            self._amounts_cents,
+            self._cattype_codes,
+            start, end, min_cents, max_cents, cattype_mask, cattype_target
+        )
 
-        # Description filter
-        desc_filter = self.desc_filter.get().strip().lower()
-        if desc_filter and desc_filter not in transaction.description.lower():
-            return False
+        # The description search runs on the shortlisted rows only
+        if desc_re is not None:
+            search = desc_re.search
+            descriptions = self._descriptions
+            indices = [i for i in indices if search(descriptions[i])]
 
-        # Category filter
-        category = self.category_filter.get()
-        if category != "All" and transaction.category != category:
-            return False
+        self._last_filters = filters
+        self._last_result = indices
+        return indices
 
-        # Type filter
-        type_filter = self.type_filter.get()
-        if type_filter != "All" and transaction.transaction_type.lower() != type_filter.lower():
-            return False
+    @staticmethod
+    def _filters_tighten(old: tuple, new: tuple) -> bool:
+        """Check whether every row matching ``new`` filters also matches ``old``.
+
+        Args:
+            old, new: (start, end, min_cents, max_cents, desc_lower,
+                cattype_mask, cattype_target) filter tuples
+
+        Returns:
+            True if the new filters are the same as or narrower than the old ones
+        """
+        old_start, old_end, old_min, old_max, old_desc, old_mask, old_target = old
+        new_start, new_end, new_min, new_max, new_desc, new_mask, new_target = new
+
+        # Lower bounds may only rise, upper bounds may only fall
+        for old_low, new_low in ((old_start, new_start), (old_min, new_min)):
+            if old_low is not None and (new_low is None or new_low < old_low):
+                return False
+        for old_high, new_high in ((old_end, new_end), (old_max, new_max)):
+            if old_high is not None and (new_high is None or new_high > old_high):
+                return False
+
+        # The new description must contain the old one, and the packed
+        # category/type filter must keep every bit the old one checked
+        return (old_desc in new_desc
+                and (new_mask & old_mask) == old_mask
+                and (new_target & old_mask) == old_target)
 
-        return True
+    @staticmethod
+    def _filter_indices(
+        candidates: Iterable[int],
+        date_days: List[int],
+        amounts_cents: List[int],
+        cattype_codes: List[int],
+        start: Optional[int],
+        end: Optional[int],
+        min_cents: Optional[int],
+        max_cents: Optional[int],
+        cattype_mask: int,
+        cattype_target: int
+    ) -> List[int]:
+        """Return the candidate indices whose column values pass every filter.
+
+        Works only on the column lists and scalar bounds, never on widgets or
+        Transaction objects. A bound of None, or a mask of 0, means that
+        filter is not active.
+
+        Args:
+            candidates: Indices into the columns to consider
+            date_days, amounts_cents, cattype_codes: Filter columns
+            start, end: Inclusive date range in days since the epoch
+            min_cents, max_cents: Inclusive amount range in cents
+            cattype_mask, cattype_target: Rows pass when
+                ``code & cattype_mask == cattype_target``
+
+        Returns:
+            The matching indices, in candidate order
+        """
+        indices = list(candidates)
+
+        if start is not None:
+            indices = [i for i in indices if date_days[i] >= start]
+        if end is not None:
+            indices = [i for i in indices if date_days[i] <= end]
+        if min_cents is not None:
+            indices = [i for i in indices if amounts_cents[i] >= min_cents]
+        if max_cents is not None:
+            indices = [i for i in indices if amounts_cents[i] <= max_cents]
+        if cattype_mask:
+            indices = [i for i in indices if (cattype_codes[i] & cattype_mask) == cattype_target]
+
+        return indices
+
+    @staticmethod
+    def _parse_filter_date(value: str) -> Optional[int]:
+        """Parse a YYYY-MM-DD filter value into days since the epoch.
+        
+        Returns None if the value is empty or invalid.
+        """
+        if not value:
+            return None
+        try:
+            parsed = datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            return None
+        return (parsed - datetime(1970, 1, 1)).days
+
+    @staticmethod
+    def _parse_filter_cents(value: str, rounding: str) -> Optional[int]:
+        """Parse an amount filter value into whole cents.
+
+        Args:
+            value: The amount entered by the user
+            rounding: ROUND_CEILING for a lower bound, ROUND_FLOOR for an upper
+                bound, so comparing against whole-cent amounts stays exact
+
+        Returns:
+            The bound in cents, or None if the value is empty or invalid
+        """
+        if not value:
+            return None
+        try:
+            return int((Decimal(value) * 100).to_integral_value(rounding=rounding))
+        except (ValueError, InvalidOperation, OverflowError):
+            return None
     
     def _auto_categorize_selected(self) -> None:
         """Auto-categorize selected transactions."""
@@ -977,6 +1167,7 @@ class MainWindow:
         current_category = values[3]  # Category is at index 3
         
         # Find similar transactions before showing the dialog
+        self._render_all_transactions()
         similar_items = []
         SIMILARITY_THRESHOLD = 0.8  # 80% similarity threshold
         
@@ -1257,6 +1448,7 @@ class MainWindow:
     
     def _auto_categorize_uncategorized(self) -> None:
         """Use AI to suggest categories for all uncategorized transactions."""
+        self._render_all_transactions()
         uncategorized = [
             item for item in self.tree.get_children()
             if self.tree.item(item)["values"][3] == "Uncategorized"
@@ -1272,12 +1464,18 @@ class MainWindow:
         ):
             return
         
+        # Ask for every suggestion up front so Claude sees them in batches
+        rows = []
         for item in uncategorized:
             values = self.tree.item(item)["values"]
-            description = values[2]
             amount = Decimal(values[1].replace("$", "").replace(",", ""))
-            
-            suggested_category = self.db.ai_handler.suggest_category(description, amount)
+            # ttk returns all-digit descriptions (e.g. cheque numbers) as ints
+            rows.append((item, values, str(values[2]), amount))
+        suggestions = self.db.ai_handler.suggest_categories_batch(
+            [(description, amount) for _, _, description, amount in rows]
+        )
+        
+        for (item, values, description, amount), suggested_category in zip(rows, suggestions):
             if suggested_category != "Uncategorized":
                 # Update in database using the correct method signature
                 self.db.update_transaction_by_attributes(
@@ -1,13 +1,20 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 import tkinter as tk
-import sqlite3
 from tkinter import ttk, messagebox
 from decimal import Decimal, InvalidOperation
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from database import Database
 
+# Verbose console logging, enabled with the RULES_DEBUG environment variable
+DEBUG = __debug__ and bool(os.environ.get("RULES_DEBUG"))
+
 class RulesWindow:
     """Panel for managing categorization rules."""
     
+    RULES_PAGE_SIZE = 50  # Rules inserted into the tree per page
+    APPLY_POLL_MS = 100   # How often to check whether applying rules has finished
+    
     def __init__(self, parent: ttk.Frame, db: Database):
         """Initialize the rules panel."""
         self.parent = parent
@@ -15,8 +22,18 @@ class RulesWindow:
         self.is_collapsed = False
         self.EXPANDED_WIDTH = 300  # Constant for expanded width
         
+        # Rules are loaded in full but only inserted into the tree page by page
+        self._all_rules = []
+        self._rendered_rules = 0
+        self._render_pending = False
+        
+        # Applying rules runs on a worker thread so the UI stays responsive
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._apply_future: Optional[Future] = None
+        
         # Debug logging
-        print("\n=== RulesWindow Initialization ===")
+        if DEBUG:
+            print("\n=== RulesWindow Initialization ===")
         
         # Create the main frame
         self.frame = ttk.Frame(parent)
@@ -54,37 +71,21 @@ class RulesWindow:
         self._verify_rules_table()  # Add verification after UI setup
         self._refresh_rules()
         
-        print("==============================\n")
+        if DEBUG:
+            print("==============================\n")
     
     def _verify_rules_table(self) -> None:
-        """Verify the rules table exists and contains data."""
+        """Verify the rules table exists and report how many rules it holds."""
         try:
-            print("\nVerifying rules table...")
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Check if table exists
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='categorization_rules'
-                """)
-                if not cursor.fetchone():
-                    print("Error: categorization_rules table does not exist!")
-                    return
-                
+            if DEBUG:
+                print("\nVerifying rules table...")
+            if not self.db.table_exists("categorization_rules"):
+                print("Error: categorization_rules table does not exist!")
+                return
+            
+            if DEBUG:
                 print("✓ categorization_rules table exists")
-                
-                # Count rules
-                cursor.execute("SELECT COUNT(*) FROM categorization_rules")
-                count = cursor.fetchone()[0]
-                print(f"Found {count} rules in database")
-                
-                # Show all rules
-                cursor.execute("SELECT * FROM categorization_rules")
-                rules = cursor.fetchall()
-                print("\nExisting rules in database:")
-                for rule in rules:
-                    print(f"  - {rule}")
+                print(f"Found {self.db.count_rules()} rules in database")
                 
         except Exception as e:
             print(f"Database verification failed: {str(e)}")
@@ -142,11 +143,12 @@ class RulesWindow:
         ).grid(row=5, column=0, columnspan=2, pady=5)
         
         # Apply Rules button
-        ttk.Button(
+        self.apply_button = ttk.Button(
             main_frame,
             text="Apply Rules to All Transactions",
             command=self._apply_rules_to_all
-        ).grid(row=1, column=0, columnspan=2, pady=5)
+        )
+        self.apply_button.grid(row=1, column=0, columnspan=2, pady=5)
         
         # Rules list
         list_frame = ttk.LabelFrame(main_frame, text="Existing Rules")
@@ -175,11 +177,11 @@ class RulesWindow:
         self.tree.column("Priority", width=50)
         
         # Add scrollbar
-        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
         
         # Pack tree and scrollbar
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
         self.tree.pack(side="left", fill="both", expand=True)
         
         # Delete button
@@ -205,39 +207,27 @@ class RulesWindow:
                 messagebox.showerror("Error", "Pattern and category are required")
                 return
             
-            # Parse amount and tolerance if provided
-            amount: Optional[str] = None  # Changed from Decimal to str
-            tolerance: Optional[str] = None  # Changed from Decimal to str
-            
-            if self.amount_entry.get().strip():
-                try:
-                    # Convert to Decimal for validation, then to string for storage
-                    amount = str(Decimal(self.amount_entry.get().strip()))
-                except InvalidOperation:
-                    messagebox.showerror("Error", "Invalid amount format")
-                    return
-            
-            if self.tolerance_entry.get().strip():
-                try:
-                    # Convert to Decimal for validation, then to string for storage
-                    tolerance = str(Decimal(self.tolerance_entry.get().strip()))
-                except InvalidOperation:
-                    messagebox.showerror("Error", "Invalid tolerance format")
-                    return
-            
-            # Get priority
-            try:
-                priority = int(self.priority_entry.get().strip() or "0")
-            except ValueError:
-                messagebox.showerror("Error", "Priority must be a number")
+            # Parse the optional fields in one pass, stopping at the first bad value
+            values = self._parse_rule_fields([
+                # (name, raw text, parser, error message)
+                ("amount", self.amount_entry.get().strip(), self._decimal_str, "Invalid amount format"),
+                ("tolerance", self.tolerance_entry.get().strip(), self._decimal_str, "Invalid tolerance format"),
+                ("priority", self.priority_entry.get().strip() or "0", int, "Priority must be a number"),
+            ])
+            if values is None:
                 return
             
-            print(f"\nAdding new rule:")
-            print(f"  Pattern: {pattern}")
-            print(f"  Category: {category}")
-            print(f"  Amount: {amount}")
-            print(f"  Tolerance: {tolerance}")
-            print(f"  Priority: {priority}")
+            amount: Optional[str] = values["amount"]
+            tolerance: Optional[str] = values["tolerance"]
+            priority: int = values["priority"]
+            
+            if DEBUG:
+                print(f"\nAdding new rule:")
+                print(f"  Pattern: {pattern}")
+                print(f"  Category: {category}")
+                print(f"  Amount: {amount}")
+                print(f"  Tolerance: {tolerance}")
+                print(f"  Priority: {priority}")
             
             # Add rule to database with string values for amount and tolerance
             self.db.add_categorization_rule(
@@ -248,7 +238,8 @@ class RulesWindow:
                 priority=priority
             )
             
-            print("Rule added successfully")
+            if DEBUG:
+                print("Rule added successfully")
             
             # Refresh display
             self._refresh_rules()
@@ -269,6 +260,36 @@ class RulesWindow:
             print(f"Error adding rule: {str(e)}")
             messagebox.showerror("Error", f"Failed to add rule: {str(e)}")
     
+    @staticmethod
+    def _decimal_str(value: str) -> str:
+        """Validate a decimal string and return it normalized for storage."""
+        return str(Decimal(value))
+    
+    @staticmethod
+    def _parse_rule_fields(
+        fields: List[Tuple[str, str, Callable[[str], Any], str]]
+    ) -> Optional[Dict[str, Any]]:
+        """Parse rule input fields, stopping at the first invalid one.
+        
+        Args:
+            fields: (name, raw text, parser, error message) tuples; empty
+                raw text parses to None
+            
+        Returns:
+            Parsed values keyed by field name, or None if a field was invalid
+        """
+        values: Dict[str, Any] = {}
+        for name, raw, parser, error in fields:
+            if not raw:
+                values[name] = None
+                continue
+            try:
+                values[name] = parser(raw)
+            except (ValueError, InvalidOperation):
+                messagebox.showerror("Error", error)
+                return None
+        return values
+    
     def _delete_rule(self) -> None:
         """Delete the selected categorization rule."""
         selection = self.tree.selection()
@@ -289,29 +310,76 @@ class RulesWindow:
             "Confirm Apply Rules",
             "This will apply rules to ALL transactions, potentially overwriting existing categories. Continue?"
         ):
-            self.db.apply_rules_to_existing_transactions()
-            # Generate an event to notify parent to refresh transactions
-            self.parent.event_generate("<<TransactionsChanged>>")
+            self.apply_button.state(["disabled"])
+            self._apply_future = self._executor.submit(self.db.apply_rules_to_existing_transactions)
+            self.parent.after(self.APPLY_POLL_MS, self._check_apply_done)
+    
+    def _check_apply_done(self) -> None:
+        """Poll the apply-rules worker and refresh transactions once it finishes.
+        
+        Tk isn't thread-safe, so the worker never touches widgets; the main
+        loop polls the future instead.
+        """
+        future = self._apply_future
+        if not future.done():
+            self.parent.after(self.APPLY_POLL_MS, self._check_apply_done)
+            return
+        
+        self._apply_future = None
+        self.apply_button.state(["!disabled"])
+        
+        error = future.exception()
+        if error is not None:
+            print(f"Error applying rules: {str(error)}")
+            messagebox.showerror("Error", f"Failed to apply rules: {str(error)}")
+            return
+        
+        # Generate an event to notify parent to refresh transactions
+        self.parent.event_generate("<<TransactionsChanged>>")
     
     def _refresh_rules(self) -> None:
         """Refresh the rules list."""
-        print("\nRefreshing rules display...")
+        if DEBUG:
+            print("\nRefreshing rules display...")
         
         # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
         
-        # Get and debug print rules
         rules = self.db.get_categorization_rules()
-        print(f"Retrieved {len(rules)} rules from database:")
-        for rule in rules:
-            print(f"  - Pattern: {rule[0]}, Category: {rule[1]}, "
-                  f"Amount: {rule[2]}, Tolerance: {rule[3]}, Priority: {rule[4]}")
-            
-            # Add to treeview
-            self.tree.insert("", "end", values=rule)
+        if DEBUG:
+            print(f"Retrieved {len(rules)} rules from database")
+        
+        # Add the first page to the treeview; scrolling loads the rest
+        self._all_rules = rules
+        self._rendered_rules = 0
+        self._render_more_rules()
         
-        print("Rules refresh complete")
+        if DEBUG:
+            print("Rules refresh complete")
+    
+    def _render_more_rules(self) -> None:
+        """Insert the next page of loaded rules into the tree."""
+        self._render_pending = False
+        start = self._rendered_rules
+        end = min(start + self.RULES_PAGE_SIZE, len(self._all_rules))
+        # Call the Tcl insert command directly, skipping ttk's option formatting;
+        # the command and widget path are hoisted out of the loop
+        call = self.tree.tk.call
+        widget = self.tree._w
+        for rule in self._all_rules[start:end]:
+            call(widget, "insert", "", "end", "-values", rule)
+        self._rendered_rules = end
+    
+    def _on_tree_scroll(self, first: str, last: str) -> None:
+        """Update the scrollbar and load another page near the bottom of the list."""
+        self.scrollbar.set(first, last)
+        if (float(last) > 0.9
+                and self._rendered_rules < len(self._all_rules)
+                and not self._render_pending):
+            self._render_pending = True
+            self.tree.after_idle(self._render_more_rules)
     
     def _toggle_collapse(self) -> None:
         """Toggle the collapsed state of the rules panel."""
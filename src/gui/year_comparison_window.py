@@ -2,9 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List
 from database import Database
-from models.transaction import Transaction
 from tkinter import messagebox
 
 class YearComparisonWindow:
@@ -79,27 +77,16 @@ class YearComparisonWindow:
             command=self._refresh_comparison
         ).pack(side="right", padx=5)
     
-    def _calculate_category_totals(self, transactions: List[Transaction]) -> Dict[str, Decimal]:
-        """Calculate total spending by category from transactions."""
-        totals: Dict[str, Decimal] = {}
-        for transaction in transactions:
-            if transaction.is_expense and not transaction.ignored:  # Only include non-ignored expenses
-                totals[transaction.category] = totals.get(transaction.category, Decimal('0')) + transaction.amount
-        return totals
-    
     def _refresh_comparison(self) -> None:
         """Refresh the year comparison display."""
         # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Get transactions for both years
-        last_year_transactions = self.db.get_transactions_for_year(self.current_year - 1)
-        this_year_transactions = self.db.get_transactions_for_year(self.current_year)
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
         
-        # Calculate totals by category
-        last_year_totals = self._calculate_category_totals(last_year_transactions)
-        this_year_totals = self._calculate_category_totals(this_year_transactions)
+        # Get totals by category for both years, summed in SQL
+        last_year_totals = self.db.get_category_totals_for_year(self.current_year - 1)
+        this_year_totals = self.db.get_category_totals_for_year(self.current_year)
         
         # Get all unique categories
         all_categories = set(last_year_totals.keys()) | set(this_year_totals.keys())
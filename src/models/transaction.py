@@ -1,9 +1,31 @@
-from dataclasses import dataclass
-from datetime import datetime
-from decimal import Decimal
-from typing import Optional
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterator, List, Optional, Tuple
 
-@dataclass
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# dataclass(slots=True) needs Python 3.10; older versions keep a __dict__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+def amount_to_cents(amount: Decimal, rounding: str = ROUND_HALF_UP) -> int:
+    """Convert an amount to whole cents.
+    
+    Infinite amounts, which older imports could store, are clamped to
+    +/-sys.maxsize and NaN becomes 0, so loading them never raises.
+    
+    Args:
+        amount: The amount to convert
+        rounding: Decimal rounding mode for sub-cent values
+    """
+    if not amount.is_finite():
+        if amount.is_nan():
+            return 0
+        return -sys.maxsize if amount.is_signed() else sys.maxsize
+    return int((amount * 100).to_integral_value(rounding=rounding))
+
+@dataclass(frozen=True, **_SLOTS)
 class Transaction:
     """Represents a single financial transaction."""
     
@@ -14,13 +36,54 @@ class Transaction:
     category: str
     transaction_type: str  # "income" or "expense"
     ignored: bool = False  # New field with default False
+    amount_cents: int = field(init=False, repr=False, compare=False)  # Amount in whole cents
+    date_epoch: int = field(init=False, repr=False, compare=False)  # Days since 1970-01-01
+    _ttype_lower: str = field(init=False, repr=False, compare=False)  # Lower-cased transaction_type
+    
+    def __post_init__(self) -> None:
+        """Cache the amount and date as integers and the lower-cased type.
+        
+        The class is frozen, so the derived fields are set through object.__setattr__.
+        """
+        object.__setattr__(self, "amount_cents", amount_to_cents(self.amount))
+        object.__setattr__(self, "date_epoch", self.date.toordinal() - _EPOCH_ORDINAL)
+        object.__setattr__(self, "_ttype_lower", self.transaction_type.lower())
     
     @property
     def is_expense(self) -> bool:
         """Check if the transaction is an expense."""
-        return self.transaction_type.lower() == "expense" and not self.ignored
+        return self._ttype_lower == "expense" and not self.ignored
     
     @property
     def is_income(self) -> bool:
         """Check if the transaction is income."""
-        return self.transaction_type.lower() == "income" and not self.ignored 
\ No newline at end of file
+        return self._ttype_lower == "income" and not self.ignored
+
+@dataclass
+class TransactionBatch:
+    """Column-oriented batch of new transactions, used for bulk inserts.
+    
+    Each list holds one field for every row, in database storage form, so
+    no Transaction objects are built while importing.
+    """
+    
+    dates: List[str] = field(default_factory=list)  # ISO format
+    amounts: List[str] = field(default_factory=list)  # Absolute values
+    descriptions: List[str] = field(default_factory=list)
+    categories: List[str] = field(default_factory=list)
+    transaction_types: List[str] = field(default_factory=list)  # "income" or "expense"
+    
+    def __len__(self) -> int:
+        return len(self.dates)
+    
+    def append(self, date: str, amount: str, description: str, category: str, transaction_type: str) -> None:
+        """Add one row to the batch."""
+        self.dates.append(date)
+        self.amounts.append(amount)
+        self.descriptions.append(description)
+        self.categories.append(category)
+        self.transaction_types.append(transaction_type)
+    
+    def rows(self) -> Iterator[Tuple[str, str, str, str, str]]:
+        """Iterate over (date, amount, description, category, transaction_type) rows."""
+        return zip(self.dates, self.amounts, self.descriptions, self.categories, self.transaction_types)
\ No newline at end of file
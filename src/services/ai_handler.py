@@ -1,12 +1,30 @@
-from typing import List, Optional, Dict, Tuple
+import functools
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Dict, Tuple
 from decimal import Decimal
 import anthropic
 from models.transaction import Transaction
 from database import Database
 
+@dataclass
+class _PatternGroup:
+    """Running summary of the transactions sharing one key-word pattern."""
+    
+    category: str
+    amount: Decimal
+    count: int = 1
+    category_consistent: bool = True
+    amount_consistent: bool = True
+    samples: List[str] = field(default_factory=list)  # First three descriptions
+
 class AIHandler:
     """Handles AI-powered operations for transaction processing using Claude."""
     
+    BATCH_SIZE = 50  # Transactions categorized per Claude request
+    CATEGORIES_TTL = 60  # Seconds the category list is cached between writes
+    
     def __init__(self, api_key: str, db: Database):
         """Initialize the AI handler with Anthropic API key.
         
@@ -19,76 +37,210 @@ class AIHandler:
         )
         self.model = "claude-3-haiku-20240307"  # Using Claude 3 Haiku
         self.db = db
+        
+        # Per-instance memo of Claude suggestions; failed calls raise and are not cached
+        self._cached_category = functools.lru_cache(maxsize=4096)(self._request_category)
+        self._cached_refinement = functools.lru_cache(maxsize=1024)(self._request_refined_pattern)
+        
+        # Category list cache; Database drops it whenever categories may change
+        self._categories_cache: Optional[Tuple[str, ...]] = None
+        self._categories_cache_ts = 0.0
+    
+    def invalidate_categories(self) -> None:
+        """Forget the cached category list so the next call re-reads it."""
+        self._categories_cache = None
+    
+    def _get_categories(self) -> Tuple[str, ...]:
+        """Get the available categories, re-reading them at most every CATEGORIES_TTL seconds."""
+        now = time.monotonic()
+        if self._categories_cache is None or now - self._categories_cache_ts >= self.CATEGORIES_TTL:
+            self._categories_cache = tuple(self.db.get_all_categories())
+            self._categories_cache_ts = now
+        return self._categories_cache
     
     def suggest_category(self, description: str, amount: Decimal) -> str:
-        """Use Claude to suggest a category based on transaction description and amount."""
+        """Use Claude to suggest a category based on transaction description and amount.
+        
+        Suggestions are memoized in-process and persisted in the database,
+        so repeated descriptions don't need another API call.
+        """
         try:
             # Get existing categories for context
-            categories = self.db.get_all_categories()
+            categories = self._get_categories()
             
-            prompt = (
-                "As a financial expert, categorize this transaction. Choose from the existing categories "
-                "or suggest 'Uncategorized' if none fit well. Respond with ONLY the category name, nothing else.\n\n"
-                f"Transaction Description: {description}\n"
-                f"Amount: ${amount}\n"
-                f"Available Categories: {', '.join(categories)}"
-            )
+            description_norm = " ".join(description.lower().split())
             
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=50,
-                temperature=0.3,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            # Reuse a stored suggestion if it is still a valid category
+            cached = self.db.get_cached_ai_category(description_norm)
+            if cached is not None and cached in categories:
+                return cached
             
-            suggested_category = response.content[0].text.strip()
-            return suggested_category if suggested_category in categories else "Uncategorized"
+            suggested_category = self._cached_category(
+                description_norm, round(amount), tuple(sorted(categories))
+            )
+            if suggested_category != "Uncategorized":
+                self.db.cache_ai_category(description_norm, suggested_category)
+            return suggested_category
             
         except Exception as e:
             print(f"AI categorization error: {e}")
             return "Uncategorized"
     
+    def suggest_categories_batch(self, items: List[Tuple[str, Decimal]]) -> List[str]:
+        """Suggest categories for many transactions with as few Claude requests as possible.
+        
+        Stored suggestions are used first; the remaining transactions are
+        sent in chunks of ``BATCH_SIZE`` per request.
+        
+        Args:
+            items: (description, amount) pairs
+            
+        Returns:
+            One category per item, in order ("Uncategorized" if none fit)
+        """
+        results: List[str] = ["Uncategorized"] * len(items)
+        try:
+            categories = self._get_categories()
+        except Exception as e:
+            print(f"AI categorization error: {e}")
+            return results
+        valid = set(categories)
+        
+        misses: List[Tuple[int, str, Decimal]] = []
+        for index, (description, amount) in enumerate(items):
+            try:
+                description_norm = " ".join(description.lower().split())
+                cached = self.db.get_cached_ai_category(description_norm)
+            except Exception as e:
+                print(f"AI categorization error: {e}")
+                continue  # Leave this transaction Uncategorized
+            if cached is not None and cached in valid:
+                results[index] = cached
+            else:
+                misses.append((index, description_norm, amount))
+        
+        for start in range(0, len(misses), self.BATCH_SIZE):
+            chunk = misses[start:start + self.BATCH_SIZE]
+            try:
+                suggestions = self._request_categories(
+                    [(description_norm, amount) for _, description_norm, amount in chunk],
+                    categories
+                )
+            except Exception as e:
+                print(f"AI categorization error: {e}")
+                continue
+            
+            for (index, description_norm, _), category in zip(chunk, suggestions):
+                if category in valid:
+                    results[index] = category
+                    self.db.cache_ai_category(description_norm, category)
+        
+        return results
+    
+    def _request_categories(self, items: List[Tuple[str, Decimal]], categories: Tuple[str, ...]) -> List[str]:
+        """Ask Claude for one category per transaction in a single request.
+        
+        Args:
+            items: (normalized description, amount) pairs
+            categories: The available categories
+            
+        Returns:
+            The suggested category for each transaction, in order
+            
+        Raises:
+            ValueError: If the response doesn't number exactly one answer per transaction
+        """
+        prompt = (
+            "As a financial expert, categorize each of these transactions. Choose from the existing "
+            "categories or suggest 'Uncategorized' if none fit well. Return ONLY one line per "
+            "transaction in the form \"N. Category\", where N is the transaction's number, nothing else.\n\n"
+            f"Available Categories: {', '.join(categories)}\n"
+            "Transactions:\n" +
+            "\n".join(f"{number}. {description} (${amount})"
+                      for number, (description, amount) in enumerate(items, 1))
+        )
+        
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=50 * len(items),
+            temperature=0.3,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        
+        # Map answers back by their number, not their line position, so an
+        # extra or missing line can't shift categories onto other transactions
+        answers: Dict[int, str] = {}
+        for line in response.content[0].text.splitlines():
+            match = re.match(r"^\s*(\d+)[.)]\s*(.+?)\s*$", line)
+            if match is None:
+                continue  # Preamble or other unnumbered text
+            number = int(match.group(1))
+            if number in answers:
+                raise ValueError(f"Transaction {number} answered more than once")
+            answers[number] = match.group(2)
+        
+        expected = set(range(1, len(items) + 1))
+        if answers.keys() != expected:
+            missing = sorted(expected - answers.keys())
+            unexpected = sorted(answers.keys() - expected)
+            raise ValueError(f"Numbered answers don't match: missing {missing}, unexpected {unexpected}")
+        return [answers[number] for number in range(1, len(items) + 1)]
+    
+    def _request_category(self, description_norm: str, amount_bucket: int, categories: Tuple[str, ...]) -> str:
+        """Ask Claude for a category. Only called through the memoized wrapper.
+        
+        Args:
+            description_norm: Lower-cased, whitespace-collapsed description
+            amount_bucket: Amount rounded to whole dollars
+            categories: Sorted tuple of the available categories
+        """
+        prompt = (
+            "As a financial expert, categorize this transaction. Choose from the existing categories "
+            "or suggest 'Uncategorized' if none fit well. Respond with ONLY the category name, nothing else.\n\n"
+            f"Transaction Description: {description_norm}\n"
+            f"Amount: ${amount_bucket}\n"
+            f"Available Categories: {', '.join(categories)}"
+        )
+        
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=50,
+            temperature=0.3,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        
+        suggested_category = response.content[0].text.strip()
+        return suggested_category if suggested_category in categories else "Uncategorized"
+    
     def generate_rules(self, transactions: List[Transaction]) -> List[Tuple[str, str, Optional[Decimal]]]:
         """Analyze transactions to suggest categorization rules."""
         try:
-            # Group similar transactions
-            transaction_patterns = {}
+            # Summarize similar transactions in a single pass
+            groups: Dict[str, _PatternGroup] = {}
             for t in transactions:
                 key_words = ' '.join(word for word in t.description.split() if len(word) > 3)
-                if key_words in transaction_patterns:
-                    transaction_patterns[key_words].append(t)
-                else:
-                    transaction_patterns[key_words] = [t]
+                group = groups.get(key_words)
+                if group is None:
+                    groups[key_words] = _PatternGroup(t.category, t.amount, samples=[t.description])
+                    continue
+                group.count += 1
+                if group.category_consistent and t.category != group.category:
+                    group.category_consistent = False
+                if group.amount_consistent and t.amount != group.amount:
+                    group.amount_consistent = False
+                if len(group.samples) < 3:
+                    group.samples.append(t.description)
             
             # Find patterns with consistent categorization
             rules = []
-            for pattern, similar_transactions in transaction_patterns.items():
-                if len(similar_transactions) >= 2:  # Only suggest rules for repeated patterns
-                    categories = {t.category for t in similar_transactions}
-                    amounts = {t.amount for t in similar_transactions}
+            for pattern, group in groups.items():
+                # Only suggest rules for repeated, consistently categorized patterns
+                if group.count >= 2 and group.category_consistent:
+                    amount = group.amount if group.amount_consistent else None
                     
-                    if len(categories) == 1:  # Consistent categorization
-                        category = categories.pop()
-                        amount = amounts.pop() if len(amounts) == 1 else None
-                        
-                        # Use Claude to validate and refine the pattern
-                        prompt = (
-                            "Given this transaction pattern, suggest a refined search pattern that would reliably "
-                            "match similar transactions. Return ONLY the pattern, nothing else.\n\n"
-                            f"Original Pattern: {pattern}\n"
-                            f"Sample Transactions:\n" + 
-                            "\n".join(t.description for t in similar_transactions[:3])
-                        )
-                        
-                        response = self.client.messages.create(
-                            model=self.model,
-                            max_tokens=50,
-                            temperature=0.3,
-                            messages=[{"role": "user", "content": prompt}]
-                        )
-                        
-                        refined_pattern = response.content[0].text.strip()
-                        rules.append((refined_pattern, category, amount))
+                    # Use Claude to validate and refine the pattern
+                    refined_pattern = self._refine_pattern(pattern, tuple(group.samples))
+                    rules.append((refined_pattern, group.category, amount))
             
             return rules
             
@@ -96,40 +248,114 @@ class AIHandler:
             print(f"Rule generation error: {e}")
             return []
     
+    def _refine_pattern(self, original: str, samples: Tuple[str, ...]) -> str:
+        """Get a refined search pattern for a group of similar transactions.
+        
+        Args:
+            original: The grouped key-word pattern
+            samples: Up to three sample descriptions from the group
+            
+        Returns:
+            A run of at least three tokens shared by every sample if there is
+            one, otherwise Claude's (memoized) refinement
+        """
+        common = self._common_token_run(samples)
+        if common is not None:
+            return common
+        return self._cached_refinement(original, samples)
+    
+    @staticmethod
+    def _common_token_run(samples: Tuple[str, ...], min_tokens: int = 3) -> Optional[str]:
+        """Find the longest run of tokens that appears in every sample.
+        
+        Args:
+            samples: Descriptions to compare
+            min_tokens: Shortest run worth returning
+            
+        Returns:
+            The run joined with spaces, or None if no run is long enough
+        """
+        if not samples:
+            return None
+        token_lists = [sample.split() for sample in samples]
+        first, others = token_lists[0], token_lists[1:]
+        for length in range(len(first), min_tokens - 1, -1):
+            for start in range(len(first) - length + 1):
+                run = first[start:start + length]
+                if all(
+                    any(tokens[i:i + length] == run for i in range(len(tokens) - length + 1))
+                    for tokens in others
+                ):
+                    return ' '.join(run)
+        return None
+    
+    def _request_refined_pattern(self, original: str, samples: Tuple[str, ...]) -> str:
+        """Ask Claude to refine a pattern. Only called through the memoized wrapper.
+        
+        Args:
+            original: The grouped key-word pattern
+            samples: Up to three sample descriptions from the group
+        """
+        prompt = (
+            "Given this transaction pattern, suggest a refined search pattern that would reliably "
+            "match similar transactions. Return ONLY the pattern, nothing else.\n\n"
+            f"Original Pattern: {original}\n"
+            f"Sample Transactions:\n" + 
+            "\n".join(samples)
+        )
+        
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=50,
+            temperature=0.3,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        
+        return response.content[0].text.strip()
+    
     def analyze_spending_patterns(self) -> Dict[str, List[str]]:
         """Analyze spending patterns and provide insights."""
         try:
-            transactions = self.db.get_transactions()
-            
-            # Prepare transaction summary
-            categories = set(t.category for t in transactions)
-            date_range = f"{min(t.date for t in transactions)} to {max(t.date for t in transactions)}"
-            
-            # Calculate category totals
-            category_totals = {}
-            for t in transactions:
-                if not t.ignored:
-                    category_totals[t.category] = category_totals.get(t.category, Decimal('0')) + t.amount
-            
-            prompt = (
-                "Analyze these transaction patterns and provide 3 key insights about spending habits. "
-                "Format as a bullet-point list.\n\n"
-                f"Total Transactions: {len(transactions)}\n"
-                f"Date Range: {date_range}\n"
-                "Category Totals:\n" +
-                "\n".join(f"- {cat}: ${total:,.2f}" for cat, total in category_totals.items())
-            )
-            
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=50,
-                temperature=0.7,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            insights = [line.strip() for line in response.content[0].text.split("\n") if line.strip()]
-            return {"insights": insights}
+            return {"insights": list(self.stream_spending_insights())}
             
         except Exception as e:
             print(f"Analysis error: {e}")
-            return {"insights": ["Analysis unavailable"]} 
\ No newline at end of file
+            return {"insights": ["Analysis unavailable"]}
+    
+    def stream_spending_insights(self) -> Iterator[str]:
+        """Stream spending insights from Claude, one line at a time.
+        
+        Yields:
+            Each non-empty line of the response as soon as it is complete
+        """
+        # Prepare transaction summary, computed in SQL
+        count, min_date, max_date, category_totals = self.db.get_summary()
+        if not count:
+            raise ValueError("No transactions to analyze")
+        date_range = f"{min_date} to {max_date}"
+        
+        prompt = (
+            "Analyze these transaction patterns and provide 3 key insights about spending habits. "
+            "Format as a bullet-point list.\n\n"
+            f"Total Transactions: {count}\n"
+            f"Date Range: {date_range}\n"
+            "Category Totals:\n" +
+            "\n".join(f"- {cat}: ${total:,.2f}" for cat, total in category_totals.items())
+        )
+        
+        # 400 tokens leaves room for three full insights
+        with self.client.messages.stream(
+            model=self.model,
+            max_tokens=400,
+            temperature=0.7,
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            pending = ""
+            for text in stream.text_stream:
+                pending += text
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    if line.strip():
+                        yield line.strip()
+            if pending.strip():
+                yield pending.strip() 
\ No newline at end of file
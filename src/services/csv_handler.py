@@ -1,14 +1,72 @@
 import csv
+import functools
+import logging
+import re
 from datetime import datetime
 from decimal import Decimal
-from typing import List
-from models.transaction import Transaction
+from typing import List, Optional, Pattern, Tuple
+from models.transaction import TransactionBatch
 import decimal
 from database import Database
 
+logger = logging.getLogger(__name__)
+
+# Numeric dates with a consistent "/" or "-" separator: year first
+# (2024-01-01) or year last (1/1/2024, 13/01/2024)
+DATE_RE = re.compile(
+    r'^\s*(?:'
+    r'(?P<y1>\d{4})(?P<s1>[-/])(?P<m1>\d{1,2})(?P=s1)(?P<d1>\d{1,2})'
+    r'|(?P<a>\d{1,2})(?P<s2>[-/])(?P<b>\d{1,2})(?P=s2)(?P<y2>\d{4})'
+    r')\s*$',
+    re.ASCII
+)
+
+# Removes currency symbols, thousands separators and whitespace from amounts
+_AMOUNT_STRIP = str.maketrans('', '', '$, \t\r\n')
+
 class CSVHandler:
     """Handles importing transactions from CSV files."""
     
+    BATCH_SIZE = 1000  # Rows inserted per executemany call
+    READ_BUFFER_SIZE = 1 << 20  # 1 MiB file buffer, fewer read() calls on large files
+    
+    DATE_FORMATS = [
+        "%m/%d/%Y",    # 1/1/2024
+        "%m-%d-%Y",    # 1-1-2024
+        "%Y-%m-%d",    # 2024-01-01
+        "%Y/%m/%d",    # 2024/01/01
+        "%d/%m/%Y",    # 01/01/2024
+        "%d-%m-%Y",    # 01-01-2024
+    ]
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _parse_date_fast(date_str: str) -> Optional[datetime]:
+        """
+        Parse a numeric date with a single regex, building the datetime directly.
+        Results are cached, since date columns repeat heavily.
+        
+        Returns:
+            The parsed date, or None if the string needs the strptime fallback
+        """
+        match = DATE_RE.match(date_str)
+        if match is None:
+            return None
+        
+        groups = match.groupdict()
+        if groups['y1'] is not None:
+            year, month, day = int(groups['y1']), int(groups['m1']), int(groups['d1'])  # 2024-01-01
+        else:
+            year, a, b = int(groups['y2']), int(groups['a']), int(groups['b'])
+            # Month first unless the first number can't be a month; when a <= 12
+            # a day-first reading is never valid where month-first isn't
+            month, day = (b, a) if a > 12 else (a, b)  # 13/01/2024 vs 1/1/2024
+        
+        try:
+            return datetime(year, month, day)
+        except ValueError:
+            return None  # Not a real date; let strptime report it
+    
     @staticmethod
     def _parse_date(date_str: str) -> datetime:
         """
@@ -19,16 +77,12 @@ class CSVHandler:
         - 2024-01-01
         - 2024/01/01
         """
-        date_formats = [
-            "%m/%d/%Y",    # 1/1/2024
-            "%m-%d-%Y",    # 1-1-2024
-            "%Y-%m-%d",    # 2024-01-01
-            "%Y/%m/%d",    # 2024/01/01
-            "%d/%m/%Y",    # 01/01/2024
-            "%d-%m-%Y",    # 01-01-2024
-        ]
-        
-        for date_format in date_formats:
+        parsed = CSVHandler._parse_date_fast(date_str)
+        if parsed is not None:
+            return parsed
+        
+        # Only dates the regex can't split (e.g. space-padded days) get here
+        for date_format in CSVHandler.DATE_FORMATS:
             try:
                 return datetime.strptime(date_str.strip(), date_format)
             except ValueError:
@@ -37,81 +91,180 @@ class CSVHandler:
         raise ValueError(f"Unable to parse date: {date_str}")
     
     @staticmethod
-    def _parse_amount(amount_str: str) -> Decimal:
+    @functools.lru_cache(maxsize=4096)
+    def _parse_amount(amount_str: str) -> Tuple[Decimal, int]:
         """
         Parse amount string to Decimal, handling common currency formats.
+        Results are cached, since recurring charges repeat the same amounts.
         
         Args:
             amount_str: String representation of amount (e.g., "50.25", "$50.25", "1,234.56")
             
         Returns:
-            Decimal: Parsed amount
+            Tuple[Decimal, int]: Absolute amount and its sign (-1 or 1)
             
         Raises:
             ValueError: If amount cannot be parsed
         """
-        # Remove currency symbols, spaces, and commas
-        cleaned_amount = amount_str.strip().replace("$", "").replace(",", "")
+        # Remove currency symbols, spaces, and commas in a single pass
+        cleaned_amount = amount_str.translate(_AMOUNT_STRIP)
+        
+        # Plain amounts with at most two decimals are parsed as integer cents
+        cents = CSVHandler._parse_cents(cleaned_amount)
+        if cents is not None:
+            return Decimal(abs(cents)).scaleb(-2), (-1 if cents < 0 else 1)
+        
         try:
-            return Decimal(cleaned_amount)
+            amount = Decimal(cleaned_amount)
         except (decimal.InvalidOperation, decimal.ConversionSyntax) as e:
             raise ValueError(f"Invalid amount format: {amount_str}") from e
+        if not amount.is_finite():
+            raise ValueError(f"Invalid amount format: {amount_str}")
+        return abs(amount), (-1 if amount < 0 else 1)
 
     @staticmethod
-    def import_transactions(file_path: str, db: Database) -> List[Transaction]:
+    def _parse_cents(cleaned_amount: str) -> Optional[int]:
+        """
+        Parse a cleaned amount like "-1234.5" into whole cents.
+        
+        Returns:
+            The amount in cents, or None if it isn't a plain decimal number
+            with at most two fractional digits
+        """
+        # Whole amounts like "-382" go straight through int()
+        if "." not in cleaned_amount:
+            try:
+                return int(cleaned_amount) * 100
+            except ValueError:
+                return None
+        
+        sign = 1
+        if cleaned_amount[:1] in ("-", "+"):
+            sign = -1 if cleaned_amount[0] == "-" else 1
+            cleaned_amount = cleaned_amount[1:]
+        
+        whole, _, frac = cleaned_amount.partition(".")
+        if not (whole or frac) or len(frac) > 2 or not cleaned_amount.isascii():
+            return None
+        if (whole and not whole.isdigit()) or (frac and not frac.isdigit()):
+            return None
+        
+        return sign * (int(whole or "0") * 100 + int(frac.ljust(2, "0")))
+    
+    @staticmethod
+    def _compile_rules(db: Database) -> Tuple[Optional[Pattern], List[str]]:
+        """
+        Compile every categorization rule into one case-insensitive regex.
+        
+        Each rule becomes a ``^(?=.*?(pattern))`` alternative, in priority
+        order, so a single search finds the highest-priority rule whose
+        pattern appears anywhere in the description (not just the leftmost).
+        
+        Returns:
+            The compiled regex (None if there are no rules) and the rule
+            categories; group N of a match belongs to categories[N - 1]
+        """
+        rules = db.get_categorization_rules()  # Highest priority first
+        if not rules:
+            return None, []
+        
+        rules_re = re.compile(
+            "|".join(f"^(?=.*?({re.escape(rule[0])}))" for rule in rules),
+            re.IGNORECASE | re.DOTALL
+        )
+        return rules_re, [rule[1] for rule in rules]
+    
+    @staticmethod
+    def import_transactions(file_path: str, db: Database) -> int:
         """
-        Import transactions from a CSV file.
+        Import transactions from a CSV file into the database.
         Expected CSV format:
         Date,Amount,Description,Type
         01/02/2025,-382,BRGHTWHL* First...,Daycare
+        
+        Rows are inserted in batches of BATCH_SIZE, all in one database
+        transaction, so a file that fails to read imports nothing.
+        
+        Returns:
+            The number of transactions imported
         """
-        transactions = []
+        batch = TransactionBatch()
+        imported = 0
+        
+        # Load the rules once and match them in-process instead of querying per row
+        rules_re, rule_categories = CSVHandler._compile_rules(db)
+        conn = db.get_connection()
         
         try:
-            with open(file_path, 'r') as csvfile:
-                reader = csv.DictReader(csvfile)
+            # newline='' lets the csv module handle line endings itself
+            with open(file_path, 'r', buffering=CSVHandler.READ_BUFFER_SIZE, newline='') as csvfile:
+                reader = csv.reader(csvfile)
                 row_count = 0
                 error_count = 0
                 
+                # Resolve the column positions once from the header
+                header = next(reader, [])
+                columns = {name: index for index, name in enumerate(header)}
+                date_col = columns.get('Date')
+                amount_col = columns.get('Amount')
+                desc_col = columns.get('Description')
+                type_col = columns.get('Type')
+                has_required = None not in (date_col, amount_col, desc_col)
+                has_type = type_col is not None
+                
                 for row_num, row in enumerate(reader, start=2):
+                    if not row:
+                        continue  # Blank line
                     row_count += 1
                     try:
-                        # Print raw row data for debugging
-                        print(f"Processing row {row_num}: {row}")
+                        # Log raw row data for debugging (formatted only if enabled)
+                        logger.debug("Processing row %d: %s", row_num, row)
+                        
+                        if not has_required:
+                            raise KeyError("CSV must have Date, Amount and Description columns")
                         
-                        amount = CSVHandler._parse_amount(row['Amount'])
-                        description = row['Description']
+                        amount, sign = CSVHandler._parse_amount(row[amount_col])
+                        description = row[desc_col]
                         
                         # Try to get category from CSV, then from rules if not provided
-                        category = row.get('Type', '').strip()
-                        if not category:
-                            category = db.auto_categorize_transaction(description)
+                        category = row[type_col].strip() if has_type and type_col < len(row) else ''
+                        if not category and rules_re is not None:
+                            match = rules_re.search(description)
+                            if match:
+                                category = rule_categories[match.lastindex - 1]
                         
                         if not category:
                             print(f"Warning: No category found for transaction: {description}")
                             category = "Uncategorized"
                         
-                        transaction = Transaction(
-                            id=None,
-                            date=CSVHandler._parse_date(row['Date']),
-                            amount=abs(amount),  # Store absolute value
-                            description=description,
-                            category=category,
-                            transaction_type="expense" if amount < 0 else "income"
+                        batch.append(
+                            CSVHandler._parse_date(row[date_col]).isoformat(),
+                            str(amount),  # Already the absolute value
+                            description,
+                            category,
+                            "expense" if sign < 0 else "income"
                         )
-                        transactions.append(transaction)
-                    except (ValueError, KeyError) as e:
+                        if len(batch) >= CSVHandler.BATCH_SIZE:
+                            imported += db.add_transactions_bulk(batch)
+                            batch = TransactionBatch()
+                    except (ValueError, KeyError, IndexError) as e:
                         error_count += 1
                         print(f"Error processing row {row_num}: {row}. Error: {e}")
                         continue
                 
+                if batch:
+                    imported += db.add_transactions_bulk(batch)
+                conn.commit()
+                
                 print(f"\nImport Summary:")
                 print(f"Total rows processed: {row_count}")
-                print(f"Successful imports: {len(transactions)}")
+                print(f"Successful imports: {imported}")
                 print(f"Failed imports: {error_count}")
                 
         except Exception as e:
+            conn.rollback()
+            imported = 0
             print(f"Error reading CSV file: {str(e)}")
-            return []
+            print("No transactions were imported")
                 
-        return transactions 
\ No newline at end of file
+        return imported 
\ No newline at end of file